@@ -1,21 +1,33 @@
-import glob
+import io
 import logging
 import os
+import stat
+import sys
+import tempfile
+from collections.abc import Generator
+from contextlib import contextmanager, suppress
 from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
 from pathlib import Path
-
-import tomlkit
-from pydantic import BaseModel, Field, HttpUrl
-from tomlkit import TOMLDocument, comment
-from tomlkit.container import Container
+from typing import TYPE_CHECKING, ClassVar
+from urllib.parse import urlparse
 
 from .util import console, path_with_tilde
 
+if TYPE_CHECKING:
+    from tomlkit import TOMLDocument
+    from tomlkit.container import Container
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:  # pragma: no cover
+    tomllib = None
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Config:
     prompt: dict
     env: dict
@@ -39,7 +51,7 @@ class Config:
         }
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ProjectConfig:
     """Project-level configuration, such as which files to include in the context by default."""
 
@@ -80,7 +92,10 @@ def get_config() -> Config:
 
 
 def load_config() -> Config:
-    config = _load_config()
+    return _config_from_dict(_load_config_fast())
+
+
+def _config_from_dict(config: dict) -> Config:
     assert "prompt" in config, "prompt key missing in config"
     assert "env" in config, "env key missing in config"
     prompt = config.pop("prompt")
@@ -90,97 +105,192 @@ def load_config() -> Config:
     return Config(prompt=prompt, env=env)
 
 
-def _load_config() -> tomlkit.TOMLDocument:
-    # Check if the config file exists
-    if not os.path.exists(config_path):
-        # If not, create it and write some default settings
-        os.makedirs(os.path.dirname(config_path), exist_ok=True)
+def _load_config_fast() -> dict:
+    """Loads the config as plain dicts, for read-only use."""
+    if tomllib is None:  # pragma: no cover
+        # no stdlib parser (Python < 3.11)
+        return _load_config_editable().unwrap()
+    try:
+        data = Path(config_path).read_bytes()
+    except FileNotFoundError:
+        # config needs to be created
+        return _load_config_editable().unwrap()
+    return tomllib.loads(data.decode())
+
+
+def _load_config_editable() -> "TOMLDocument":
+    """Loads the config as a format-preserving document, for mutations."""
+    import tomlkit  # fmt: skip
+
+    try:
+        return tomlkit.parse(Path(config_path).read_bytes().decode())
+    except FileNotFoundError:
+        # If the config file doesn't exist, create it and write some default settings
+        Path(config_path).parent.mkdir(parents=True, exist_ok=True)
         toml = tomlkit.dumps(default_config.dict())
-        with open(config_path, "w") as config_file:
-            config_file.write(toml)
+        _write_config(toml)
         console.log(f"Created config file at {config_path}")
-        doc = tomlkit.loads(toml)
-        return doc
-    else:
-        with open(config_path) as config_file:
-            doc = tomlkit.load(config_file)
-        return doc
+        return tomlkit.loads(toml)
+
+
+def _write_config(toml: str) -> None:
+    """
+    Writes the config atomically, via a temporary file renamed over the old one,
+    so that concurrent gptme processes never read a truncated or partial config.
+    """
+    # replace the real file, so a symlinked config (e.g. from dotfiles) stays a symlink
+    target = os.path.realpath(config_path)
+    try:
+        # keep the mode of the existing config, it may have been restricted since it holds API keys
+        mode = stat.S_IMODE(os.stat(target).st_mode)
+    except FileNotFoundError:
+        mode = 0o600
+    # unique name, so leftovers from a killed process never block a later write
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(target), prefix=f".{os.path.basename(target)}."
+    )
+    try:
+        with open(fd, "w") as config_file:
+            config_file.write(toml)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, target)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def config_transaction() -> Generator["TOMLDocument", None, None]:
+    """
+    Loads the config document once, yields it for any number of mutations,
+    then writes it back in a single dump and updates the cached config.
+    """
+    import tomlkit  # fmt: skip
 
+    global _config
+    doc = _load_config_editable()
+    try:
+        yield doc
+
+        # Write the config
+        _write_config(tomlkit.dumps(doc))
+    except BaseException:
+        # Invalidate, config is reloaded from disk on next access
+        _config = None
+        raise
+
+    # The document now matches the file, so derive the config from it instead of re-reading.
+    # Nothing else is cached: every transaction parses the file anew, so changes made by the
+    # user or other gptme processes since the last write are never lost.
+    _config = _config_from_dict(doc.unwrap())
 
-def set_config_value(key: str, value: str) -> None:  # pragma: no cover
-    doc: TOMLDocument | Container = _load_config()
 
-    # Set the value
+def _set_value(doc: "TOMLDocument", key: str, value: str) -> None:
     keypath = key.split(".")
-    d = doc
+    d: TOMLDocument | Container = doc
     for key in keypath[:-1]:
         d = d.get(key, {})
     d[keypath[-1]] = value
 
-    # Write the config
-    with open(config_path, "w") as config_file:
-        tomlkit.dump(doc, config_file)
 
-    # Reload config
-    global _config
-    _config = load_config()
+def set_config_value(key: str, value: str) -> None:  # pragma: no cover
+    set_config_values({key: value})
 
 
-def comment_out(key: str, extra_comment: str):  # progma: no cover
-    doc: TOMLDocument | Container = _load_config()
+def set_config_values(values: dict[str, str]) -> None:
+    """Sets several (dotted) keys at once, with a single read and write of the config file."""
+    with config_transaction() as doc:
+        for key, value in values.items():
+            _set_value(doc, key, value)
 
-    # Set the value
-    keypath = key.split(".")
-    d = doc
-    for key in keypath[:-1]:
-        d = d.get(key, {})
 
-    _key = keypath[-1]
-    if value := d.get(_key, None):
-        # drop old
-        del d[_key]
-        # comment out
-        d.add(comment(f"{_key} = {value} # {extra_comment}"))
+def comment_out(key: str, extra_comment: str):  # progma: no cover
+    from tomlkit import comment  # fmt: skip
 
-    # Write the config
-    with open(config_path, "w") as config_file:
-        tomlkit.dump(doc, config_file)
+    with config_transaction() as doc:
+        keypath = key.split(".")
+        d: TOMLDocument | Container = doc
+        for key in keypath[:-1]:
+            d = d.get(key, {})
 
-    # Reload config
-    global _config
-    _config = load_config()
+        _key = keypath[-1]
+        if value := d.get(_key, None):
+            # drop old
+            del d[_key]
+            # comment out
+            d.add(comment(f"{_key} = {value} # {extra_comment}"))
 
 
 def get_workspace_prompt(workspace: str) -> str:
-    project_config_paths = [
-        p
-        for p in (
-            Path(workspace) / "gptme.toml",
-            Path(workspace) / ".github" / "gptme.toml",
-        )
-        if p.exists()
-    ]
-    if project_config_paths:
-        project_config_path = project_config_paths[0]
-        console.log(
-            f"Using project configuration at {path_with_tilde(project_config_path)}"
-        )
-        # load project config
-        with open(project_config_path) as f:
-            project_config = tomlkit.load(f)
-            project = ProjectConfig(**project_config)  # type: ignore
-            # expand with glob
-            files = [p for file in project.files for p in glob.glob(file)]
-            for file in files:
-                if not Path(file).exists():
-                    logger.error(
-                        f"File {file} specified in project config does not exist"
-                    )
-                    exit(1)
-        return "\n\nSelected project files, read more with cat:\n" + "\n\n".join(
-            [f"```{Path(file).name}\n{Path(file).read_text()}\n```" for file in files]
-        )
-    return ""
+    import glob  # fmt: skip
+
+    for project_config_path in (
+        Path(workspace) / "gptme.toml",
+        Path(workspace) / ".github" / "gptme.toml",
+    ):
+        try:
+            config_stat = os.stat(project_config_path)
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        return ""
+
+    console.log(
+        f"Using project configuration at {path_with_tilde(project_config_path)}"
+    )
+    project = _load_project_config(
+        str(project_config_path), config_stat.st_mtime_ns, config_stat.st_size
+    )
+    # expand with glob, dropping duplicates but keeping the configured order
+    files = dict.fromkeys(p for pattern in project.files for p in glob.iglob(pattern))
+
+    # stat each file, both to check that it exists and to detect changes since the last call
+    file_stats = []
+    missing = []
+    for file in files:
+        try:
+            st = os.stat(file)
+        except FileNotFoundError:
+            missing.append(file)
+            continue
+        file_stats.append((os.path.abspath(file), st.st_mtime_ns, st.st_size))
+    if missing:
+        for file in missing:
+            logger.error(f"File {file} specified in project config does not exist")
+        exit(1)
+
+    return _format_project_files(tuple(file_stats))
+
+
+@lru_cache(maxsize=8)
+def _load_project_config(path: str, mtime_ns: int, size: int) -> ProjectConfig:
+    """Loads the project config, cached until the file is modified (mtime and size are part of the key)."""
+    import tomlkit  # fmt: skip
+
+    with open(path) as f:
+        project_config = tomlkit.load(f)
+    return ProjectConfig(**project_config)  # type: ignore
+
+
+@lru_cache(maxsize=8)
+def _format_project_files(file_stats: tuple[tuple[str, int, int], ...]) -> str:
+    """
+    Formats the selected project files for the prompt.
+
+    Keyed on (path, mtime, size) of each file, so files are only re-read when changed.
+    """
+    buf = io.StringIO()
+    buf.write("\n\nSelected project files, read more with cat:\n")
+    for i, (file, _, _) in enumerate(file_stats):
+        path = Path(file)
+        if i:
+            buf.write("\n\n")
+        buf.write(f"```{path.name}\n")
+        buf.write(path.read_bytes().decode())
+        buf.write("\n```")
+    return buf.getvalue()
 
 
 class Provider(str, Enum):
@@ -190,32 +300,46 @@ class Provider(str, Enum):
     OPENROUTER = "openrouter"
     LOCAL = "local"
 
-    def is_openrouter(self) -> bool: 
+    def is_openrouter(self) -> bool:
         return self == Provider.OPENROUTER
+
     def is_openai_alike(self) -> bool:
-        return self in [
-            Provider.OPENAI,
-            Provider.AZURE_OPENAI,
-            Provider.OPENROUTER,
-            Provider.LOCAL,
-        ]
+        return self in _OPENAI_ALIKE
 
     def is_anthropic_alike(self) -> bool:
-        return self == Provider.ANTHROPIC
+        return self in _ANTHROPIC_ALIKE
 
     def __repr__(self) -> str:
         return self.value
 
 
-class LLMAPIConfig(BaseModel):
-    endpoint: HttpUrl | None = Field(default=None)
+_OPENAI_ALIKE = frozenset(
+    {
+        Provider.OPENAI,
+        Provider.AZURE_OPENAI,
+        Provider.OPENROUTER,
+        Provider.LOCAL,
+    }
+)
+_ANTHROPIC_ALIKE = frozenset({Provider.ANTHROPIC})
+
+
+@dataclass(slots=True)
+class LLMAPIConfig:
     token: str
     provider: Provider
-    model: str | None
+    endpoint: str | None = None
+    model: str | None = None
 
-    _envvar_api_key: str = "API_KEY"
-    _envvar_provider: str = "API_PROVIDER"
-    _envvar_model: str = "API_MODEL"
+    _envvar_api_key: ClassVar[str] = "API_KEY"
+    _envvar_provider: ClassVar[str] = "API_PROVIDER"
+    _envvar_model: ClassVar[str] = "API_MODEL"
+
+    def __post_init__(self):
+        if self.endpoint is not None:
+            url = urlparse(self.endpoint)
+            if url.scheme not in ("http", "https") or not url.netloc:
+                raise ValueError(f"Invalid API endpoint URL: {self.endpoint}")
 
     @property
     def _envvar_endpoint(self) -> str:
@@ -224,17 +348,20 @@ class LLMAPIConfig(BaseModel):
         return ""
 
     def save_to_config(self):
-        set_config_value(f"env.{self._envvar_api_key}", self.token)
-        set_config_value(f"env.{self._envvar_provider}", self.provider.value)
+        values = {
+            f"env.{self._envvar_api_key}": self.token,
+            f"env.{self._envvar_provider}": self.provider.value,
+        }
         if not self._envvar_endpoint:
             logger.warning(
                 f"Provider {self.provider.value} has no custom endpoint, skipping saving to config"
             )
-            return
-        if self.model:
-            set_config_value(f"env.{self._envvar_model}", self.model)
-        if self.endpoint:
-            set_config_value(f"env.{self._envvar_endpoint}", str(self.endpoint))
+        else:
+            if self.model:
+                values[f"env.{self._envvar_model}"] = self.model
+            if self.endpoint:
+                values[f"env.{self._envvar_endpoint}"] = str(self.endpoint)
+        set_config_values(values)
 
 
 if __name__ == "__main__":
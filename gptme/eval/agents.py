@@ -1,5 +1,9 @@
+import hashlib
 import logging
+import os
 from abc import abstractmethod
+from datetime import datetime
+from functools import lru_cache
 
 from gptme import Message
 from gptme import chat as gptme_chat
@@ -26,13 +30,38 @@ class Agent:
         raise NotImplementedError
 
 
+def _prompt_id(prompt: str) -> int:
+    """Short ID for a prompt, stable across processes (unlike the salted builtin `hash`)."""
+    digest = hashlib.blake2b(prompt.encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % 1000000
+
+
+@lru_cache(maxsize=1)
+def _system_prompt() -> Message:
+    """System prompt for evals, constant for the process (needs tools to be initialized first)."""
+    prompt_sys = get_prompt()
+    return prompt_sys.replace(
+        content=prompt_sys.content
+        + "\n\nIf you have trouble and dont seem to make progress, stop trying."
+    )
+
+
 class GPTMe(Agent):
+    def __init__(self, model: str):
+        super().__init__(model)
+        # model name safe for use in paths
+        self._safe_model = model.replace("/", "--")
+
     def act(self, files: Files | None, prompt: str):
-        _id = abs(hash(prompt)) % 1000000
-        name = get_name(f"gptme-evals-{self.model.replace('/', '--')}-{_id}")
+        _id = _prompt_id(prompt)
+        # The prompt ID is the same on every run, so the date alone would give a rerun of the
+        # same prompt on the same day the same name, and the FileExistsError below.
+        # The time of day is what keeps the names of reruns unique.
+        timestr = datetime.now().strftime("%Y-%m-%d-%H%M%S")
+        name = get_name(f"{timestr}-gptme-evals-{self._safe_model}-{_id}")
         log_dir = get_logs_dir() / name
         workspace_dir = log_dir / "workspace"
-        if workspace_dir.exists():
+        if os.path.exists(workspace_dir):
             raise FileExistsError(
                 f"Workspace directory {workspace_dir} already exists."
             )
@@ -46,15 +75,10 @@ class GPTMe(Agent):
 
         print("\n--- Start of generation ---")
         logger.debug(f"Working in {store.working_dir}")
-        prompt_sys = get_prompt()
-        prompt_sys = prompt_sys.replace(
-            content=prompt_sys.content
-            + "\n\nIf you have trouble and dont seem to make progress, stop trying."
-        )
         try:
             gptme_chat(
                 [Message("user", prompt)],
-                [prompt_sys],
+                [_system_prompt()],
                 logdir=log_dir,
                 model=self.model,
                 no_confirm=True,
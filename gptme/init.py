@@ -2,7 +2,6 @@ import atexit
 import logging
 import readline
 from dataclasses import dataclass
-from typing import Any, cast
 
 from dotenv import load_dotenv
 from rich.prompt import Prompt
@@ -79,7 +78,7 @@ def create_from_config(override_model: str | None = None) -> LLMAPIConfig | None
         api_key = config.get_env_required("API_KEY")
         provider = config.get_env_required("API_PROVIDER")
         return LLMAPIConfig(
-            endpoint=cast(Any, endpoint),
+            endpoint=endpoint,
             token=api_key,
             provider=Provider(provider),
             model=override_model if override_model else raw_model,
@@ -103,7 +102,7 @@ def create_from_prompt(override_model: str | None = None) -> LLMAPIConfig:
     model = _prompt_api_model()
 
     return LLMAPIConfig(
-        endpoint=cast(Any, endpoint),
+        endpoint=endpoint,
         token=api_key,
         provider=Provider(provider),
         model=override_model if override_model else model,
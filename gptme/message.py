@@ -9,9 +9,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Literal
 
-import tomlkit
 from rich.syntax import Syntax
-from tomlkit._utils import escape_string
 from typing_extensions import Self
 
 from .codeblock import Codeblock
@@ -185,6 +183,8 @@ class Message:
 
     def to_toml(self) -> str:
         """Converts a message to a TOML string, for easy editing by hand in editor to then be parsed back."""
+        from tomlkit._utils import escape_string  # fmt: skip
+
         flags = []
         if self.pinned:
             flags.append("pinned")
@@ -216,6 +216,7 @@ timestamp = "{self.timestamp.isoformat()}"
 
         The string can be a single [[message]].
         """
+        import tomlkit  # fmt: skip
 
         t = tomlkit.parse(toml)
         assert "message" in t and isinstance(t["message"], dict)
@@ -330,6 +331,8 @@ def toml_to_msgs(toml: str) -> list[Message]:
 
     The string can be a whole file with multiple [[messages]].
     """
+    import tomlkit  # fmt: skip
+
     t = tomlkit.parse(toml)
     assert "messages" in t and isinstance(t["messages"], list)
     msgs: list[dict] = t["messages"]  # type: ignore
@@ -1,7 +1,186 @@
-from gptme.config import load_config
+import os
+import stat
+
+import pytest
+
+import gptme.config
+from gptme.config import (
+    LLMAPIConfig,
+    Provider,
+    comment_out,
+    config_transaction,
+    default_config,
+    get_config,
+    get_workspace_prompt,
+    load_config,
+    set_config_value,
+)
+
+
+@pytest.fixture
+def tmp_config(tmp_path, monkeypatch):
+    """Points the config at a (not yet created) file in a temporary directory."""
+    path = tmp_path / "gptme" / "config.toml"
+    monkeypatch.setattr(gptme.config, "config_path", str(path))
+    monkeypatch.setattr(gptme.config, "_config", None)
+    return path
 
 
 def test_load_config():
     config = load_config()
     print(f"config: {config}")
     assert config
+
+
+def test_config_transaction(tmp_config):
+
+    with config_transaction() as doc:
+        doc["env"]["API_KEY"] = "key"
+        doc["env"]["API_PROVIDER"] = "openai"
+
+    config = get_config()
+    assert config.env["API_KEY"] == "key"
+    assert config.env["API_PROVIDER"] == "openai"
+
+    set_config_value("env.API_MODEL", "gpt-4o")
+    comment_out("env.API_KEY", "DEPRECATED")
+    assert get_config().env == {"API_PROVIDER": "openai", "API_MODEL": "gpt-4o"}
+    assert load_config().env == get_config().env
+    # written atomically, no temporary files left behind
+    assert [p.name for p in tmp_config.parent.iterdir()] == ["config.toml"]
+
+
+def test_set_config_value_external_edit(tmp_config):
+    set_config_value("env.A", "1")
+    # edited by the user (or another gptme process) between writes
+    with open(tmp_config, "a") as f:
+        f.write('B = "2"\n')
+    set_config_value("env.C", "3")
+    assert load_config().env == {"A": "1", "B": "2", "C": "3"}
+
+    # deleted config is recreated with defaults
+    tmp_config.unlink()
+    assert load_config().env == {}
+    assert tmp_config.exists()
+
+
+def test_write_config_keeps_mode_and_symlink(tmp_path, tmp_config):
+    real = tmp_path / "dotfiles" / "config.toml"
+    link = tmp_config
+
+    # new configs are only readable by the user
+    set_config_value("env.A", "1")
+    assert stat.S_IMODE(link.stat().st_mode) == 0o600
+
+    # mode and symlink of an existing config survive a write
+    real.parent.mkdir()
+    link.rename(real)
+    link.symlink_to(real)
+    real.chmod(0o640)
+    set_config_value("env.B", "2")
+    assert link.is_symlink()
+    assert stat.S_IMODE(real.stat().st_mode) == 0o640
+    assert load_config().env == {"A": "1", "B": "2"}
+
+
+def test_write_config_leftover_tmp(tmp_config):
+    set_config_value("env.A", "1")
+    # temp file left behind by a killed process, possibly with the same PID
+    leftovers = [
+        tmp_config.parent / f"config.toml.{os.getpid()}.tmp",
+        tmp_config.parent / ".config.toml.leftover",
+    ]
+    for leftover in leftovers:
+        leftover.write_text("stale")
+
+    set_config_value("env.B", "2")
+    assert load_config().env == {"A": "1", "B": "2"}
+    # not ours to remove, nor to overwrite
+    assert all(leftover.read_text() == "stale" for leftover in leftovers)
+
+
+def test_get_workspace_prompt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("hello")
+    (tmp_path / "b.txt").write_text("world")
+    (tmp_path / "gptme.toml").write_text('files = ["a.txt", "*.txt"]')
+
+    prompt = get_workspace_prompt(str(tmp_path))
+    assert prompt == (
+        "\n\nSelected project files, read more with cat:\n"
+        "```a.txt\nhello\n```\n\n```b.txt\nworld\n```"
+    )
+
+
+def test_get_workspace_prompt_no_config(tmp_path):
+    assert get_workspace_prompt(str(tmp_path)) == ""
+
+
+def test_load_config_creates_default(tmp_config):
+    config = load_config()
+    assert tmp_config.exists()
+    assert config.prompt == default_config.prompt
+
+
+def test_llm_api_config_endpoint():
+    cfg = LLMAPIConfig(
+        token="key", provider=Provider.LOCAL, endpoint="http://localhost:8080/v1"
+    )
+    assert cfg.endpoint == "http://localhost:8080/v1"
+    assert cfg.model is None
+
+    with pytest.raises(ValueError):
+        LLMAPIConfig(token="key", provider=Provider.LOCAL, endpoint="localhost:8080")
+
+
+def test_get_workspace_prompt_modified(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    file = tmp_path / "a.txt"
+    file.write_text("hello")
+    (tmp_path / "gptme.toml").write_text('files = ["a.txt"]')
+    prompt = get_workspace_prompt(str(tmp_path))
+    assert "hello" in prompt
+
+    # unchanged files are served from the cache
+    cache_info = gptme.config._format_project_files.cache_info
+    hits = cache_info().hits
+    assert get_workspace_prompt(str(tmp_path)) == prompt
+    assert cache_info().hits == hits + 1
+
+    # same size, so only the changed mtime tells the cache to re-read the file
+    mtime_ns = file.stat().st_mtime_ns
+    file.write_text("howdy")
+    os.utime(file, ns=(mtime_ns + 1_000_000_000, mtime_ns + 1_000_000_000))
+    assert "howdy" in get_workspace_prompt(str(tmp_path))
+    assert cache_info().hits == hits + 1
+
+
+def test_get_workspace_prompt_project_config_modified(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("hello")
+    (tmp_path / "b.txt").write_text("world")
+    project_config = tmp_path / "gptme.toml"
+    project_config.write_text('files = ["a.txt"]')
+    assert "a.txt" in get_workspace_prompt(str(tmp_path))
+
+    # edit keeping the mtime (as on filesystems with coarse mtimes), picked up by the size
+    st = project_config.stat()
+    project_config.write_text('files = ["a.txt", "b.txt"]')
+    os.utime(project_config, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert "b.txt" in get_workspace_prompt(str(tmp_path))
+
+
+def test_save_to_config(tmp_config):
+
+    LLMAPIConfig(
+        token="key",
+        provider=Provider.OPENAI,
+        endpoint="http://localhost:8080/v1",
+        model="gpt-4o",
+    ).save_to_config()
+    assert load_config().env == {
+        "API_KEY": "key",
+        "API_PROVIDER": "openai",
+        "API_MODEL": "gpt-4o",
+        "API_ENDPOINT": "http://localhost:8080/v1",
+    }
@@ -2,7 +2,7 @@ import pytest
 from click.testing import CliRunner
 from gptme.config import load_config
 from gptme.eval import execute, tests
-from gptme.eval.agents import GPTMe
+from gptme.eval.agents import GPTMe, _prompt_id
 from gptme.eval.main import main
 
 
@@ -20,6 +20,12 @@ def _detect_model():
         pytest.skip("No API key found for OpenAI or Anthropic")
 
 
+def test_prompt_id():
+    # stable across processes (unlike hash()), so a fixed prompt gives a fixed ID
+    assert _prompt_id("hello") == 620535
+    assert all(0 <= _prompt_id(str(i)) < 1_000_000 for i in range(100))
+
+
 @pytest.mark.slow
 def test_eval_cli():
     model = _detect_model()